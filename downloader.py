@@ -2,19 +2,82 @@ import sys
 import os
 import re
 import json
+import time
+import uuid
+import hmac
+import hashlib
+import secrets
+import errno
+import shutil
+import tempfile
+import struct
+import unicodedata
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import requests
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
+from spotipy.cache_handler import CacheHandler
 import yt_dlp
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                             QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                             QTextEdit, QRadioButton, QFileDialog, QStackedWidget,
-                            QListWidget, QListWidgetItem, QCheckBox, QComboBox,
+                            QListWidget, QListWidgetItem, QListView, QComboBox,
+                            QAbstractItemView, QSpinBox,
                             QProgressBar, QFrame, QScrollArea, QGridLayout,
                             QMessageBox, QSpacerItem, QSizePolicy, QGroupBox)
-from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QTimer, QAbstractListModel, QModelIndex
 from PyQt5.QtGui import QFont, QIcon, QPixmap, QPalette, QColor
 
 ENCRYPTION_KEY = b"SpotifyDownloader2025"
+CREDENTIALS_FILE = "credential.cdi"
+TOKEN_FILE = "token.cdi"
+TOKEN_REFRESH_MARGIN = 600
+TOKEN_CHECK_INTERVAL = 60000
+SYNCS_FILE = "syncs.json"
+SESSION_FILE = "session.snap"
+SESSION_MAGIC = b"SDSS"
+SESSION_VERSION = 1
+SESSION_HEADER = struct.Struct("<4sHIII")
+SESSION_TRACK_FIELDS = ('id', 'name', 'artist', 'album', 'isrc')
+SESSION_SAVE_DELAY = 1000
+SEARCH_CACHE_SIZE = 256
+
+SCRATCH_PREFIX = "spotifydownloader-"
+DEFAULT_CONCURRENT_FRAGMENTS = 1
+DEFAULT_BUFFER_SIZE = 1024
+UNKNOWN_TRACK_DURATION = 600
+SOURCE_AUDIO_KBPS = 320
+SIZE_SAFETY_FACTOR = 1.5
+
+DUPLICATE_DURATION_TOLERANCE_MS = 3000
+VERSION_SUFFIX_PATTERN = re.compile(
+    r"\s*(?:[(\[][^)\]]*\b(?:remaster(?:ed)?|single|album|mono|stereo)\b[^)\]]*[)\]]"
+    r"|\s-\s.*\b(?:remaster(?:ed)?|single|album|mono|stereo)\b.*$)",
+    re.IGNORECASE)
+
+SCHEDULE_IN_ORDER = "order"
+SCHEDULE_SHORTEST_FIRST = "shortest"
+
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_CONCURRENCY = 3
+SERVICE_TOKEN_FILE = "service.token"
+SERVICE_TOKEN_HEADER = "X-Service-Token"
+SERVICE_MAX_BODY = 16 * 1024 * 1024
+FORMAT_CHOICES = ["mp3", "wav", "flac", "aac"]
+QUALITY_CHOICES = ["128k", "192k", "256k", "320k"]
+SYNC_CHECK_INTERVAL = 5
+
+QUEUE_FILE = "queue.db"
+QUEUE_LEASE_SECONDS = 120
+QUEUE_MAX_ATTEMPTS = 3
+QUEUE_POLL_INTERVAL = 2
 
 def encrypt_credentials(text):
     text_bytes = text.encode('utf-8')
@@ -28,9 +91,457 @@ def decrypt_credentials(encrypted_hex):
     decrypted = bytes(a ^ b for a, b in zip(encrypted_bytes, key_bytes[:len(encrypted_bytes)]))
     return decrypted.decode('utf-8')
 
+def load_saved_credentials():
+    if not os.path.exists(CREDENTIALS_FILE):
+        return None
+    with open(CREDENTIALS_FILE, "r", encoding="utf-8") as file:
+        lines = file.readlines()
+    if len(lines) < 2:
+        return None
+    return decrypt_credentials(lines[0].strip()), decrypt_credentials(lines[1].strip())
+
+def write_file_atomic(path, data):
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as file:
+        file.write(data)
+    os.replace(temp_path, path)
+
+def load_service_token(create=False):
+    if os.path.exists(SERVICE_TOKEN_FILE):
+        with open(SERVICE_TOKEN_FILE, "r", encoding="utf-8") as file:
+            token = file.read().strip()
+        if token:
+            return token
+    if not create:
+        return None
+    token = secrets.token_hex(32)
+    temp_path = f"{SERVICE_TOKEN_FILE}.tmp"
+    if os.path.lexists(temp_path):
+        os.remove(temp_path)
+    fd = os.open(temp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as file:
+        file.write(token)
+    os.replace(temp_path, SERVICE_TOKEN_FILE)
+    return token
+
+def validate_field(payload, key, field_type, required=False, default=None, choices=None):
+    value = payload.get(key)
+    if value is None:
+        if required:
+            raise ValueError(f"Missing field: {key}")
+        return default
+    if not isinstance(value, field_type) or (field_type is int and isinstance(value, bool)):
+        raise ValueError(f"Field '{key}' must be of type {field_type.__name__}")
+    if choices and value not in choices:
+        raise ValueError(f"Field '{key}' must be one of: {', '.join(choices)}")
+    return value
+
+def remove_saved_credentials():
+    for path in (CREDENTIALS_FILE, TOKEN_FILE):
+        if os.path.exists(path):
+            os.remove(path)
+
+class EncryptedTokenCache(CacheHandler):
+    def __init__(self, client_id, client_secret, path=TOKEN_FILE):
+        self.credentials_hash = hashlib.sha256(f"{client_id}\0{client_secret}".encode('utf-8')).hexdigest()
+        self.path = path
+
+    def get_cached_token(self):
+        if not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as file:
+                token_info = json.loads(decrypt_credentials(file.read().strip()))
+        except Exception as e:
+            print(f"Error loading token cache: {str(e)}")
+            return None
+        if not hmac.compare_digest(token_info.pop('credentials_hash', ""), self.credentials_hash):
+            return None
+        return token_info
+
+    def save_token_to_cache(self, token_info):
+        try:
+            data = encrypt_credentials(json.dumps(dict(token_info, credentials_hash=self.credentials_hash)))
+            write_file_atomic(self.path, data)
+        except Exception as e:
+            print(f"Error saving token cache: {str(e)}")
+
+def create_spotify_client(client_id, client_secret):
+    return spotipy.Spotify(auth_manager=SpotifyClientCredentials(
+        client_id=client_id,
+        client_secret=client_secret,
+        cache_handler=EncryptedTokenCache(client_id, client_secret)
+    ))
+
+def refresh_token_if_expiring(sp, margin=TOKEN_REFRESH_MARGIN):
+    auth_manager = sp.auth_manager
+    token_info = auth_manager.cache_handler.get_cached_token()
+    if token_info and token_info['expires_at'] - time.time() > margin:
+        return False
+    auth_manager.get_access_token(as_dict=False, check_cache=False)
+    return True
+
+def extract_playlist_id(playlist_url):
+    match = re.search(r"playlist/([\w\d]+)", playlist_url)
+    return match.group(1) if match else None
+
+def fetch_playlist_tracks(sp, playlist_id, on_page=None):
+    tracks = []
+    offset = 0
+    limit = 100
+
+    while True:
+        results = sp.playlist_tracks(playlist_id, offset=offset, limit=limit)
+        for track_item in results['items']:
+            track = track_item['track']
+            if track:
+                tracks.append({
+                    'id': track.get('id') or "",
+                    'name': track['name'],
+                    'artist': track['artists'][0]['name'],
+                    'album': (track.get('album') or {}).get('name') or "",
+                    'isrc': (track.get('external_ids') or {}).get('isrc') or "",
+                    'duration_ms': track.get('duration_ms') or 0,
+                })
+
+        if len(results['items']) < limit:
+            break
+        offset += limit
+
+        if on_page:
+            on_page()
+
+    return tracks
+
+def track_label(track):
+    return f"{track['name']} - {track['artist']}"
+
+def normalize_tokens(text):
+    text = text.casefold()
+    if not text.isascii():
+        text = unicodedata.normalize('NFKD', text)
+        text = "".join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[\W_]+", " ", text).split()
+
+class SongIndex:
+    def __init__(self, tracks):
+        self.token_rows = {}
+        for row, track in enumerate(tracks):
+            text = f"{track['name']} {track['artist']} {track.get('album') or ''}"
+            for token in set(normalize_tokens(text)):
+                self.token_rows.setdefault(token, []).append(row)
+
+        self.grams = {}
+        for token in self.token_rows:
+            for length in range(1, 4):
+                for i in range(len(token) - length + 1):
+                    self.grams.setdefault(token[i:i + length], set()).add(token)
+        self.cache = {}
+
+    def matching_tokens(self, fragment):
+        if len(fragment) <= 3:
+            return self.grams.get(fragment, ())
+
+        candidates = None
+        for trigram in sorted({fragment[i:i + 3] for i in range(len(fragment) - 2)},
+                              key=lambda trigram: len(self.grams.get(trigram, ()))):
+            tokens = self.grams.get(trigram)
+            if not tokens:
+                return []
+            candidates = set(tokens) if candidates is None else candidates & tokens
+            if not candidates:
+                return []
+        return [token for token in candidates if fragment in token]
+
+    def rows_for(self, fragment):
+        rows = self.cache.get(fragment)
+        if rows is None:
+            rows = set()
+            for token in self.matching_tokens(fragment):
+                rows.update(self.token_rows[token])
+            if len(self.cache) >= SEARCH_CACHE_SIZE:
+                self.cache.clear()
+            self.cache[fragment] = rows
+        return rows
+
+    def search(self, query):
+        fragments = normalize_tokens(query)
+        if not fragments:
+            return None
+
+        result = None
+        for fragment in sorted(set(fragments), key=len, reverse=True):
+            rows = self.rows_for(fragment)
+            result = set(rows) if result is None else result & rows
+            if not result:
+                break
+        return sorted(result)
+
+class SongListModel(QAbstractListModel):
+    checks_changed = pyqtSignal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.tracks = []
+        self.checked = bytearray()
+        self.rows = []
+
+    def set_tracks(self, tracks, checked=None):
+        self.beginResetModel()
+        self.tracks = tracks
+        if checked:
+            self.checked = bytearray(bool(is_checked) for is_checked in checked)
+        else:
+            self.checked = bytearray(b"\x01" * len(self.tracks))
+        self.rows = list(range(len(self.tracks)))
+        self.endResetModel()
+
+    def set_visible_rows(self, rows):
+        self.beginResetModel()
+        self.rows = list(range(len(self.tracks))) if rows is None else rows
+        self.endResetModel()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row = self.rows[index.row()]
+        if role == Qt.DisplayRole:
+            return track_label(self.tracks[row])
+        if role == Qt.CheckStateRole:
+            return Qt.Checked if self.checked[row] else Qt.Unchecked
+        return None
+
+    def setData(self, index, value, role=Qt.EditRole):
+        if not index.isValid() or role != Qt.CheckStateRole:
+            return False
+        self.checked[self.rows[index.row()]] = value == Qt.Checked
+        self.dataChanged.emit(index, index, [Qt.CheckStateRole])
+        self.checks_changed.emit()
+        return True
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsUserCheckable
+
+    def set_visible_checked(self, is_checked):
+        if not self.rows:
+            return
+        if len(self.rows) == len(self.tracks):
+            self.checked = bytearray([int(is_checked)]) * len(self.tracks)
+        else:
+            for row in self.rows:
+                self.checked[row] = is_checked
+        self.dataChanged.emit(self.index(0), self.index(len(self.rows) - 1), [Qt.CheckStateRole])
+        self.checks_changed.emit()
+
+    def checked_states(self):
+        return [bool(is_checked) for is_checked in self.checked]
+
+    def checked_tracks(self):
+        return [track for track, is_checked in zip(self.tracks, self.checked) if is_checked]
+
+def normalize_title(title):
+    return " ".join(normalize_tokens(VERSION_SUFFIX_PATTERN.sub("", title)))
+
+def find_duplicate_groups(tracks):
+    parent = list(range(len(tracks)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    def union(i, j):
+        root_i, root_j = find(i), find(j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+
+    first_seen = {}
+    buckets = {}
+    for i, track in enumerate(tracks):
+        for key in (('id', track.get('id')), ('isrc', track.get('isrc'))):
+            if key[1]:
+                if key in first_seen:
+                    union(first_seen[key], i)
+                else:
+                    first_seen[key] = i
+        bucket = (normalize_title(track['name']), " ".join(normalize_tokens(track['artist'])))
+        buckets.setdefault(bucket, []).append(i)
+
+    for rows in buckets.values():
+        rows = sorted((i for i in rows if tracks[i].get('duration_ms')), key=lambda i: tracks[i]['duration_ms'])
+        anchor = None
+        for row in rows:
+            if anchor is not None and tracks[row]['duration_ms'] - tracks[anchor]['duration_ms'] <= DUPLICATE_DURATION_TOLERANCE_MS:
+                union(anchor, row)
+            else:
+                anchor = row
+
+    groups = {}
+    for i in range(len(tracks)):
+        groups.setdefault(find(i), []).append(i)
+    return [rows for root, rows in sorted(groups.items()) if len(rows) > 1]
+
+def dedupe_tracks(tracks):
+    groups = find_duplicate_groups(tracks)
+    skipped = {i for rows in groups for i in rows[1:]}
+    unique = [track for i, track in enumerate(tracks) if i not in skipped]
+    return unique, [[tracks[i] for i in rows] for rows in groups]
+
+def build_ydl_opts(output_folder, format_choice, quality, concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS,
+                   buffer_size=DEFAULT_BUFFER_SIZE):
+    return {
+        'format': 'bestaudio/best',
+        'outtmpl': f'{output_folder}/%(title)s.%(ext)s',
+        'postprocessors': [{
+            'key': 'FFmpegExtractAudio',
+            'preferredcodec': format_choice,
+            'preferredquality': quality,
+        }],
+        'concurrent_fragment_downloads': concurrent_fragments,
+        'buffersize': buffer_size,
+        'quiet': True,
+    }
+
+def estimate_output_size(duration_ms, format_choice, quality):
+    seconds = (duration_ms or 0) / 1000 or UNKNOWN_TRACK_DURATION
+    if format_choice == "wav":
+        kbps = 1411
+    elif format_choice == "flac":
+        kbps = 1000
+    else:
+        kbps = int(quality.rstrip("k"))
+    return int(seconds * kbps * 1000 / 8 * SIZE_SAFETY_FACTOR)
+
+def check_free_space(path, required_bytes):
+    free_bytes = shutil.disk_usage(path).free
+    if free_bytes < required_bytes:
+        raise OSError(errno.ENOSPC, f"Not enough free space in {path}: "
+                                    f"{free_bytes // (1024 * 1024)} MB free, "
+                                    f"{required_bytes // (1024 * 1024) + 1} MB needed")
+
+def reserve_target_path(output_folder, filename):
+    stem, extension = os.path.splitext(filename)
+    copy_number = 1
+    while True:
+        name = filename if copy_number == 1 else f"{stem} ({copy_number}){extension}"
+        target_path = os.path.join(output_folder, name)
+        try:
+            with open(target_path, "xb"):
+                return target_path
+        except FileExistsError:
+            copy_number += 1
+
+def move_into_place(source_path, output_folder):
+    target_path = reserve_target_path(output_folder, os.path.basename(source_path))
+    try:
+        try:
+            os.replace(source_path, target_path)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            temp_path = os.path.join(output_folder, f".{os.path.basename(target_path)}.partial")
+            try:
+                with open(source_path, "rb") as source, open(temp_path, "wb") as target:
+                    shutil.copyfileobj(source, target, 1024 * 1024)
+                    target.flush()
+                    os.fsync(target.fileno())
+                os.replace(temp_path, target_path)
+            except BaseException:
+                if os.path.exists(temp_path):
+                    os.remove(temp_path)
+                raise
+            os.remove(source_path)
+    except BaseException:
+        if os.path.exists(target_path) and os.path.getsize(target_path) == 0:
+            os.remove(target_path)
+        raise
+    return target_path
+
+class SongDownloader:
+    def __init__(self, output_folder, format_choice, quality, scratch_folder=None,
+                 concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.output_folder = output_folder
+        self.format_choice = format_choice
+        self.quality = quality
+        scratch_folder = scratch_folder or tempfile.gettempdir()
+        os.makedirs(scratch_folder, exist_ok=True)
+        os.makedirs(output_folder, exist_ok=True)
+        self.scratch_dir = tempfile.mkdtemp(prefix=SCRATCH_PREFIX, dir=scratch_folder)
+        self.ydl = yt_dlp.YoutubeDL(build_ydl_opts(self.scratch_dir, format_choice, quality,
+                                                   concurrent_fragments, buffer_size))
+
+    def download(self, song, duration_ms=0, before_move=None):
+        output_size = estimate_output_size(duration_ms, self.format_choice, self.quality)
+        source_size = int(((duration_ms or 0) / 1000 or UNKNOWN_TRACK_DURATION) * SOURCE_AUDIO_KBPS * 1000 / 8)
+        if os.stat(self.scratch_dir).st_dev == os.stat(self.output_folder).st_dev:
+            check_free_space(self.output_folder, output_size + source_size)
+        else:
+            check_free_space(self.scratch_dir, output_size + source_size)
+            check_free_space(self.output_folder, output_size)
+
+        query = f"ytsearch:{song.strip()} audio"
+        try:
+            self.ydl.download([query])
+            if before_move is not None and not before_move():
+                return False
+            for name in os.listdir(self.scratch_dir):
+                if not name.endswith((".part", ".ytdl", ".temp")):
+                    move_into_place(os.path.join(self.scratch_dir, name), self.output_folder)
+            return True
+        finally:
+            for name in os.listdir(self.scratch_dir):
+                path = os.path.join(self.scratch_dir, name)
+                if os.path.isdir(path):
+                    shutil.rmtree(path, ignore_errors=True)
+                else:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+
+    def close(self):
+        self.ydl.close()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+class LoginWorker(QThread):
+    login_success = pyqtSignal(object)
+    error = pyqtSignal(str)
+
+    def __init__(self, client_id, client_secret):
+        super().__init__()
+        self.client_id = client_id
+        self.client_secret = client_secret
+
+    def run(self):
+        try:
+            sp = create_spotify_client(self.client_id, self.client_secret)
+            sp.search(q="a", type="track", limit=1)
+            self.login_success.emit(sp)
+        except Exception as e:
+            self.error.emit(str(e))
+
+class TokenRefresher(QThread):
+    error = pyqtSignal(str)
+
+    def __init__(self, sp):
+        super().__init__()
+        self.sp = sp
+
+    def run(self):
+        try:
+            refresh_token_if_expiring(self.sp)
+        except Exception as e:
+            self.error.emit(str(e))
+
 class PlaylistLoader(QThread):
     progress = pyqtSignal(str)
-    playlist_loaded = pyqtSignal(list, str)
+    playlist_loaded = pyqtSignal(list, str, str)
     error = pyqtSignal(str)
 
     def __init__(self, sp, playlist_url):
@@ -43,12 +554,11 @@ class PlaylistLoader(QThread):
             self.progress.emit("Extracting playlist ID...")
             self.msleep(100)  
 
-            match = re.search(r"playlist/([\w\d]+)", self.playlist_url)
-            if not match:
+            playlist_id = extract_playlist_id(self.playlist_url)
+            if not playlist_id:
                 self.error.emit("Invalid playlist URL. Please enter a valid Spotify playlist URL.")
                 return
 
-            playlist_id = match.group(1)
             self.progress.emit("Loading playlist information...")
             self.msleep(100)  
 
@@ -57,76 +567,955 @@ class PlaylistLoader(QThread):
             self.progress.emit("Fetching tracks...")
             self.msleep(100)  
 
-            tracks = []
-            offset = 0
-            limit = 100
+            tracks = fetch_playlist_tracks(self.sp, playlist_id, on_page=lambda: self.msleep(50))
 
-            while True:
-                results = self.sp.playlist_tracks(playlist_id, offset=offset, limit=limit)
-                for track_item in results['items']:
-                    track = track_item['track']
-                    if track:
-                        name = track['name']
-                        artist = track['artists'][0]['name']
-                        tracks.append(f"{name} - {artist}")
+            self.playlist_loaded.emit(tracks, playlist_info['name'], playlist_info['snapshot_id'])
 
-                if len(results['items']) < limit:
-                    break
-                offset += limit
+        except Exception as e:
+            self.error.emit(f"Failed to load playlist: {str(e)}")
 
-                if offset % 100 == 0:
-                    self.msleep(50)
+class IndexBuilder(QThread):
+    index_built = pyqtSignal(object, object)
 
-            self.playlist_loaded.emit(tracks, playlist_info['name'])
+    def __init__(self, tracks, parent=None):
+        super().__init__(parent)
+        self.tracks = tracks
+
+    def run(self):
+        self.index_built.emit(self.tracks, SongIndex(self.tracks))
+
+class SnapshotChecker(QThread):
+    snapshot_checked = pyqtSignal(str)
+    error = pyqtSignal(str)
+
+    def __init__(self, sp, playlist_url):
+        super().__init__()
+        self.sp = sp
+        self.playlist_url = playlist_url
 
+    def run(self):
+        try:
+            playlist_id = extract_playlist_id(self.playlist_url)
+            if playlist_id:
+                playlist_info = self.sp.playlist(playlist_id, fields="snapshot_id")
+                self.snapshot_checked.emit(playlist_info['snapshot_id'])
         except Exception as e:
-            self.error.emit(f"Failed to load playlist: {str(e)}")
+            self.error.emit(str(e))
+
+class DownloadQueue:
+    def __init__(self, tracks, policy=SCHEDULE_IN_ORDER):
+        self.lock = threading.Lock()
+        self.policy = policy
+        self.items = [{'id': i, 'track': track, 'position': i, 'priority': 0, 'paused': False}
+                      for i, track in enumerate(tracks)]
+        self.total = len(self.items)
+        self.manual_order = False
+
+    def sort_key(self, item):
+        if self.manual_order:
+            return (item['position'],)
+        if self.policy == SCHEDULE_SHORTEST_FIRST:
+            return (-item['priority'], item['track'].get('duration_ms') or float('inf'), item['position'])
+        return (-item['priority'], item['position'])
+
+    def pending(self):
+        with self.lock:
+            return [dict(item) for item in sorted(self.items, key=self.sort_key)]
+
+    def next_item(self):
+        with self.lock:
+            candidates = [item for item in self.items if not item['paused']]
+            if not candidates:
+                return None
+            item = min(candidates, key=self.sort_key)
+            self.items.remove(item)
+            return item
+
+    def has_items(self):
+        with self.lock:
+            return bool(self.items)
+
+    def find(self, item_id):
+        for item in self.items:
+            if item['id'] == item_id:
+                return item
+        return None
+
+    def get(self, item_id):
+        with self.lock:
+            item = self.find(item_id)
+            return dict(item) if item is not None else None
+
+    def set_policy(self, policy):
+        with self.lock:
+            self.policy = policy
+            self.manual_order = False
+
+    def set_priority(self, item_id, priority):
+        with self.lock:
+            item = self.find(item_id)
+            if item is not None:
+                item['priority'] = priority
+                self.manual_order = False
+
+    def set_paused(self, item_id, paused):
+        with self.lock:
+            item = self.find(item_id)
+            if item is not None:
+                item['paused'] = paused
+
+    def reorder(self, item_ids):
+        with self.lock:
+            positions = {item_id: position for position, item_id in enumerate(item_ids)}
+            for item in sorted(self.items, key=self.sort_key):
+                if item['id'] not in positions:
+                    positions[item['id']] = len(positions)
+            for item in self.items:
+                item['position'] = positions[item['id']]
+            self.manual_order = True
 
 class DownloadWorker(QThread):
     progress = pyqtSignal(str)
     song_progress = pyqtSignal(str, int)
+    song_finished = pyqtSignal(str)
+    queue_changed = pyqtSignal()
     download_complete = pyqtSignal()
+    download_stopped = pyqtSignal()
     error = pyqtSignal(str)
 
-    def __init__(self, songs, output_folder, format_choice, quality):
+    def __init__(self, download_queue, output_folder, format_choice, quality, scratch_folder=None,
+                 concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS, buffer_size=DEFAULT_BUFFER_SIZE):
         super().__init__()
-        self.songs = songs
+        self.download_queue = download_queue
         self.output_folder = output_folder
         self.format_choice = format_choice
         self.quality = quality
+        self.scratch_folder = scratch_folder
+        self.concurrent_fragments = concurrent_fragments
+        self.buffer_size = buffer_size
         self.is_running = True
 
     def run(self):
+        downloader = None
         try:
-            for i, song in enumerate(self.songs):
-                if not self.is_running:
-                    break
-
+            downloader = SongDownloader(self.output_folder, self.format_choice, self.quality, self.scratch_folder,
+                                        self.concurrent_fragments, self.buffer_size)
+            done = 0
+            while self.is_running:
+                item = self.download_queue.next_item()
+                if item is None:
+                    if not self.download_queue.has_items():
+                        break
+                    self.progress.emit("Waiting for paused songs...")
+                    self.msleep(200)
+                    continue
+
+                song = track_label(item['track'])
+                self.queue_changed.emit()
                 self.progress.emit(f"Downloading: {song}")
-                self.song_progress.emit(song, int((i / len(self.songs)) * 100))
-
-                query = f"ytsearch:{song.strip()} audio"
-                ydl_opts = {
-                    'format': 'bestaudio/best',
-                    'outtmpl': f'{self.output_folder}/%(title)s.%(ext)s',
-                    'postprocessors': [{
-                        'key': 'FFmpegExtractAudio',
-                        'preferredcodec': self.format_choice,
-                        'preferredquality': self.quality,
-                    }],
-                    'quiet': True,
-                }
+                self.song_progress.emit(song, int((done / self.download_queue.total) * 100))
 
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([query])
+                downloader.download(song, item['track'].get('duration_ms'))
+                done += 1
+                self.song_finished.emit(song)
 
-            self.download_complete.emit()
+            if self.is_running:
+                self.download_complete.emit()
+            else:
+                self.download_stopped.emit()
         except Exception as e:
             self.error.emit(str(e))
+        finally:
+            if downloader:
+                downloader.close()
 
     def stop(self):
         self.is_running = False
 
+class DownloadService:
+    def __init__(self, sp, max_concurrent=SERVICE_CONCURRENCY, scratch_folder=None,
+                 concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS, buffer_size=DEFAULT_BUFFER_SIZE):
+        self.sp = sp
+        self.scratch_folder = scratch_folder
+        self.concurrent_fragments = concurrent_fragments
+        self.buffer_size = buffer_size
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrent)
+        self.lock = threading.RLock()
+        self.jobs = {}
+        self.cancel_events = {}
+        self.syncs = {}
+        self.playlist_cache = {}
+        self.downloader_local = threading.local()
+        self.downloaders = []
+        self.stop_event = threading.Event()
+        self.load_syncs()
+        self.scheduler = threading.Thread(target=self.run_scheduler, daemon=True)
+        self.scheduler.start()
+
+    def get_downloader(self, output_folder, format_choice, quality):
+        cache = getattr(self.downloader_local, 'cache', None)
+        if cache is None:
+            cache = self.downloader_local.cache = {}
+        key = (output_folder, format_choice, quality)
+        if key not in cache:
+            cache[key] = SongDownloader(output_folder, format_choice, quality, self.scratch_folder,
+                                        self.concurrent_fragments, self.buffer_size)
+            with self.lock:
+                self.downloaders.append(cache[key])
+        return cache[key]
+
+    def load_playlist(self, playlist_url):
+        playlist_id = extract_playlist_id(playlist_url)
+        if not playlist_id:
+            raise ValueError("Invalid playlist URL")
+
+        playlist_info = self.sp.playlist(playlist_id, fields="name,snapshot_id")
+        with self.lock:
+            cached = self.playlist_cache.get(playlist_id)
+        if cached and cached['snapshot_id'] == playlist_info['snapshot_id']:
+            return playlist_info['name'], cached['songs'], cached['duplicates']
+
+        tracks, duplicate_groups = dedupe_tracks(fetch_playlist_tracks(self.sp, playlist_id))
+        songs = [track_label(track) for track in tracks]
+        duplicates = sum(len(group) - 1 for group in duplicate_groups)
+        with self.lock:
+            self.playlist_cache[playlist_id] = {
+                'snapshot_id': playlist_info['snapshot_id'],
+                'songs': songs,
+                'duplicates': duplicates,
+            }
+        return playlist_info['name'], songs, duplicates
+
+    def submit(self, output_folder, format_choice, quality, songs=None, playlist_url=None, sync_id=None):
+        if not songs and not playlist_url:
+            raise ValueError("Either songs or playlist_url is required")
+
+        job_id = uuid.uuid4().hex[:12]
+        job = {
+            'id': job_id,
+            'status': 'queued',
+            'playlist_url': playlist_url,
+            'playlist_name': None,
+            'output_folder': output_folder,
+            'format': format_choice,
+            'quality': quality,
+            'sync_id': sync_id,
+            'songs': list(songs or []),
+            'total': len(songs or []),
+            'duplicates': 0,
+            'done': 0,
+            'completed': 0,
+            'failed': [],
+            'current': [],
+            'error': None,
+            'created': time.time(),
+        }
+        with self.lock:
+            self.jobs[job_id] = job
+            self.cancel_events[job_id] = threading.Event()
+        threading.Thread(target=self.start_job, args=(job_id,), daemon=True).start()
+        return self.get_job(job_id)
+
+    def start_job(self, job_id):
+        job = self.jobs[job_id]
+        try:
+            if not job['songs']:
+                job['status'] = 'loading'
+                job['playlist_name'], songs, job['duplicates'] = self.load_playlist(job['playlist_url'])
+                if job['sync_id']:
+                    with self.lock:
+                        sync = self.syncs.get(job['sync_id'])
+                        done = set(sync['done']) if sync else set()
+                    songs = [song for song in songs if song not in done]
+                job['songs'] = songs
+                job['total'] = len(songs)
+
+            if self.cancel_events[job_id].is_set():
+                job['status'] = 'cancelled'
+                return
+            if not job['songs']:
+                job['status'] = 'completed'
+                return
+
+            job['status'] = 'running'
+            for song in job['songs']:
+                self.executor.submit(self.download, job_id, song)
+        except Exception as e:
+            job['status'] = 'failed'
+            job['error'] = str(e)
+
+    def download(self, job_id, song):
+        job = self.jobs[job_id]
+        cancelled = self.cancel_events[job_id].is_set()
+        try:
+            if not cancelled:
+                with self.lock:
+                    job['current'].append(song)
+                downloader = self.get_downloader(job['output_folder'], job['format'], job['quality'])
+                downloader.download(song)
+                with self.lock:
+                    job['completed'] += 1
+                    sync = self.syncs.get(job['sync_id'])
+                    if sync is not None:
+                        sync['done'].append(song)
+        except Exception as e:
+            with self.lock:
+                job['failed'].append({'song': song, 'error': str(e)})
+        finally:
+            with self.lock:
+                if song in job['current']:
+                    job['current'].remove(song)
+                job['done'] += 1
+                if job['done'] == job['total']:
+                    if self.cancel_events[job_id].is_set():
+                        job['status'] = 'cancelled'
+                    else:
+                        job['status'] = 'completed'
+                    if job['sync_id']:
+                        self.save_syncs()
+
+    def get_job(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            info = {key: value for key, value in job.items() if key != 'songs'}
+            info['current'] = list(job['current'])
+            info['failed'] = list(job['failed'])
+        info['progress'] = int((info['done'] / info['total']) * 100) if info['total'] else 0
+        return info
+
+    def list_jobs(self):
+        with self.lock:
+            job_ids = list(self.jobs)
+        return [self.get_job(job_id) for job_id in job_ids]
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            self.cancel_events[job_id].set()
+            if job['status'] in ('queued', 'loading', 'running'):
+                job['status'] = 'cancelling'
+        return self.get_job(job_id)
+
+    def register_sync(self, playlist_url, output_folder, format_choice, quality, interval):
+        if not extract_playlist_id(playlist_url):
+            raise ValueError("Invalid playlist URL")
+
+        sync_id = uuid.uuid4().hex[:12]
+        with self.lock:
+            self.syncs[sync_id] = {
+                'id': sync_id,
+                'playlist_url': playlist_url,
+                'output_folder': output_folder,
+                'format': format_choice,
+                'quality': quality,
+                'interval': interval,
+                'next_run': time.time(),
+                'last_job': None,
+                'done': [],
+            }
+            self.save_syncs()
+        return self.get_sync(sync_id)
+
+    def get_sync(self, sync_id):
+        with self.lock:
+            sync = self.syncs.get(sync_id)
+            if sync is None:
+                return None
+            info = {key: value for key, value in sync.items() if key != 'done'}
+            info['downloaded'] = len(sync['done'])
+        return info
+
+    def list_syncs(self):
+        with self.lock:
+            sync_ids = list(self.syncs)
+        return [self.get_sync(sync_id) for sync_id in sync_ids]
+
+    def remove_sync(self, sync_id):
+        with self.lock:
+            sync = self.syncs.pop(sync_id, None)
+            if sync is not None:
+                self.save_syncs()
+        return sync is not None
+
+    def load_syncs(self):
+        if not os.path.exists(SYNCS_FILE):
+            return
+        try:
+            with open(SYNCS_FILE, "r", encoding="utf-8") as file:
+                for sync in json.load(file):
+                    sync['last_job'] = None
+                    self.syncs[sync['id']] = sync
+        except Exception as e:
+            print(f"Error loading syncs: {str(e)}")
+
+    def save_syncs(self):
+        with self.lock:
+            data = json.dumps(list(self.syncs.values()))
+            write_file_atomic(SYNCS_FILE, data)
+
+    def run_scheduler(self):
+        while not self.stop_event.wait(SYNC_CHECK_INTERVAL):
+            try:
+                refresh_token_if_expiring(self.sp)
+            except Exception as e:
+                print(f"Token refresh failed: {str(e)}")
+
+            now = time.time()
+            with self.lock:
+                due = []
+                for sync in self.syncs.values():
+                    last_job = self.jobs.get(sync['last_job'])
+                    if last_job and last_job['status'] in ('queued', 'loading', 'running', 'cancelling'):
+                        continue
+                    if sync['next_run'] <= now:
+                        sync['next_run'] = now + sync['interval']
+                        due.append(sync)
+
+            for sync in due:
+                job = self.submit(sync['output_folder'], sync['format'], sync['quality'],
+                                  playlist_url=sync['playlist_url'], sync_id=sync['id'])
+                with self.lock:
+                    sync['last_job'] = job['id']
+
+    def shutdown(self):
+        self.stop_event.set()
+        for event in self.cancel_events.values():
+            event.set()
+        self.executor.shutdown(wait=True)
+        for downloader in self.downloaders:
+            downloader.close()
+        self.save_syncs()
+
+class ServiceRequestHandler(BaseHTTPRequestHandler):
+    service = None
+    token = None
+
+    def authorize(self):
+        host, port = self.server.server_address[:2]
+        allowed_hosts = {f"{name}:{port}" for name in (host, "127.0.0.1", "localhost")}
+        if self.headers.get('Host') not in allowed_hosts:
+            self.send_json(403, {'error': "Invalid Host header"})
+            return False
+        supplied_token = self.headers.get(SERVICE_TOKEN_HEADER, "").encode('latin-1', errors='replace')
+        if not hmac.compare_digest(supplied_token, self.token.encode('latin-1')):
+            self.send_json(403, {'error': "Invalid or missing service token"})
+            return False
+        return True
+
+    def do_GET(self):
+        if not self.authorize():
+            return
+        parts = self.path.strip("/").split("/")
+        if parts == ["jobs"]:
+            self.send_json(200, self.service.list_jobs())
+        elif len(parts) == 2 and parts[0] == "jobs":
+            self.send_result(self.service.get_job(parts[1]))
+        elif parts == ["syncs"]:
+            self.send_json(200, self.service.list_syncs())
+        elif len(parts) == 2 and parts[0] == "syncs":
+            self.send_result(self.service.get_sync(parts[1]))
+        else:
+            self.send_json(404, {'error': "Not found"})
+
+    def do_POST(self):
+        if not self.authorize():
+            return
+        parts = self.path.strip("/").split("/")
+        if parts not in (["jobs"], ["syncs"]):
+            self.send_json(404, {'error': "Not found"})
+            return
+        content_type = self.headers.get('Content-Type', "").split(";")[0].strip().lower()
+        if content_type != "application/json":
+            self.send_json(415, {'error': "Content-Type must be application/json"})
+            return
+
+        try:
+            payload = self.read_json()
+            output_folder = validate_field(payload, 'output_folder', str, required=True)
+            if not os.path.isabs(output_folder):
+                raise ValueError("Field 'output_folder' must be an absolute path")
+            format_choice = validate_field(payload, 'format', str, default="mp3", choices=FORMAT_CHOICES)
+            quality = validate_field(payload, 'quality', str, default="192k", choices=QUALITY_CHOICES)
+
+            if parts == ["jobs"]:
+                songs = validate_field(payload, 'songs', list)
+                if songs is not None and not all(isinstance(song, str) and song.strip() for song in songs):
+                    raise ValueError("Field 'songs' must be a list of non-empty strings")
+                playlist_url = validate_field(payload, 'playlist_url', str)
+                job = self.service.submit(output_folder, format_choice, quality, songs=songs,
+                                          playlist_url=playlist_url)
+                self.send_json(201, job)
+            else:
+                playlist_url = validate_field(payload, 'playlist_url', str, required=True)
+                interval = validate_field(payload, 'interval', int, default=3600)
+                if interval <= 0:
+                    raise ValueError("Field 'interval' must be positive")
+                sync = self.service.register_sync(playlist_url, output_folder, format_choice, quality, interval)
+                self.send_json(201, sync)
+        except ValueError as e:
+            self.send_json(400, {'error': str(e)})
+
+    def do_DELETE(self):
+        if not self.authorize():
+            return
+        parts = self.path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "jobs":
+            self.send_result(self.service.cancel(parts[1]))
+        elif len(parts) == 2 and parts[0] == "syncs":
+            self.send_result({'removed': True} if self.service.remove_sync(parts[1]) else None)
+        else:
+            self.send_json(404, {'error': "Not found"})
+
+    def read_json(self):
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            raise ValueError("Invalid Content-Length")
+        if length < 0 or length > SERVICE_MAX_BODY:
+            self.close_connection = True
+            raise ValueError(f"Content-Length must be between 0 and {SERVICE_MAX_BODY}")
+        if not length:
+            return {}
+        try:
+            payload = json.loads(self.rfile.read(length).decode('utf-8'))
+        except (UnicodeDecodeError, json.JSONDecodeError):
+            raise ValueError("Request body is not valid JSON")
+        if not isinstance(payload, dict):
+            raise ValueError("Request body must be a JSON object")
+        return payload
+
+    def send_result(self, result):
+        if result is None:
+            self.send_json(404, {'error': "Not found"})
+        else:
+            self.send_json(200, result)
+
+    def send_json(self, status, payload):
+        body = json.dumps(payload).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class ServiceClient:
+    def __init__(self, host=SERVICE_HOST, port=SERVICE_PORT, timeout=5):
+        self.base_url = f"http://{host}:{port}"
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers[SERVICE_TOKEN_HEADER] = load_service_token() or ""
+
+    def request(self, method, path, payload=None, timeout=None):
+        response = self.session.request(method, self.base_url + path, json=payload,
+                                        timeout=timeout or self.timeout)
+        data = response.json()
+        if response.status_code >= 400:
+            raise RuntimeError(data.get('error', f"Service returned {response.status_code}"))
+        return data
+
+    def is_available(self):
+        try:
+            self.request("GET", "/jobs", timeout=0.5)
+            return True
+        except (requests.RequestException, ValueError, RuntimeError):
+            return False
+
+    def submit_job(self, output_folder, format_choice, quality, songs=None, playlist_url=None):
+        return self.request("POST", "/jobs", {
+            'output_folder': output_folder,
+            'format': format_choice,
+            'quality': quality,
+            'songs': songs,
+            'playlist_url': playlist_url,
+        })
+
+    def get_job(self, job_id):
+        return self.request("GET", f"/jobs/{job_id}")
+
+    def list_jobs(self):
+        return self.request("GET", "/jobs")
+
+    def cancel_job(self, job_id):
+        return self.request("DELETE", f"/jobs/{job_id}")
+
+    def register_sync(self, playlist_url, output_folder, format_choice, quality, interval):
+        return self.request("POST", "/syncs", {
+            'playlist_url': playlist_url,
+            'output_folder': output_folder,
+            'format': format_choice,
+            'quality': quality,
+            'interval': interval,
+        })
+
+    def list_syncs(self):
+        return self.request("GET", "/syncs")
+
+    def remove_sync(self, sync_id):
+        return self.request("DELETE", f"/syncs/{sync_id}")
+
+class RemoteDownloadWorker(QThread):
+    progress = pyqtSignal(str)
+    song_progress = pyqtSignal(str, int)
+    download_complete = pyqtSignal()
+    download_stopped = pyqtSignal()
+    error = pyqtSignal(str)
+
+    def __init__(self, client, job_id):
+        super().__init__()
+        self.client = client
+        self.job_id = job_id
+        self.is_running = True
+
+    def run(self):
+        try:
+            while self.is_running:
+                job = self.client.get_job(self.job_id)
+                current = job['current'][0] if job['current'] else ""
+                if current:
+                    self.progress.emit(f"Downloading: {current}")
+                self.song_progress.emit(current, job['progress'])
+
+                if job['status'] == 'completed':
+                    if job['failed']:
+                        self.error.emit(f"{len(job['failed'])} of {job['total']} songs failed, "
+                                        f"first error: {job['failed'][0]['error']}")
+                    else:
+                        self.download_complete.emit()
+                    return
+                if job['status'] in ('failed', 'cancelled'):
+                    self.error.emit(job['error'] or f"Job {job['status']}")
+                    return
+
+                self.msleep(500)
+            self.download_stopped.emit()
+        except Exception as e:
+            self.error.emit(str(e))
+
+    def stop(self):
+        self.is_running = False
+        try:
+            self.client.cancel_job(self.job_id)
+        except Exception:
+            pass
+
+class WorkQueue:
+    def __init__(self, path, journal_mode="wal"):
+        self.path = path
+        self.connection = sqlite3.connect(path, timeout=30, isolation_level=None)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute(f"PRAGMA journal_mode={journal_mode}")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.executescript("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                name TEXT,
+                output_folder TEXT NOT NULL,
+                format TEXT NOT NULL,
+                quality TEXT NOT NULL,
+                created REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                job_id TEXT NOT NULL REFERENCES jobs(id),
+                song TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                finished REAL
+            );
+            CREATE INDEX IF NOT EXISTS items_claim ON items(status, lease_until);
+        """)
+
+    def close(self):
+        self.connection.close()
+
+    def create_job(self, songs, output_folder, format_choice, quality, name=None):
+        job_id = uuid.uuid4().hex[:12]
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute(
+                "INSERT INTO jobs (id, name, output_folder, format, quality, created) VALUES (?, ?, ?, ?, ?, ?)",
+                (job_id, name, output_folder, format_choice, quality, time.time()))
+            self.connection.executemany(
+                "INSERT INTO items (job_id, song) VALUES (?, ?)",
+                [(job_id, song) for song in songs])
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return job_id
+
+    def claim(self, worker_id, lease_seconds=QUEUE_LEASE_SECONDS, max_attempts=QUEUE_MAX_ATTEMPTS):
+        now = time.time()
+        self.connection.execute("BEGIN IMMEDIATE")
+        try:
+            self.connection.execute(
+                "UPDATE items SET status = 'failed', worker = NULL, lease_until = NULL, "
+                "error = COALESCE(error, 'Worker lease expired') "
+                "WHERE status = 'leased' AND lease_until < ? AND attempts >= ?",
+                (now, max_attempts))
+            row = self.connection.execute(
+                "SELECT items.id, items.job_id, items.song, jobs.output_folder, jobs.format, jobs.quality "
+                "FROM items JOIN jobs ON jobs.id = items.job_id "
+                "WHERE items.status = 'pending' OR (items.status = 'leased' AND items.lease_until < ?) "
+                "ORDER BY items.id LIMIT 1",
+                (now,)).fetchone()
+            if row is not None:
+                self.connection.execute(
+                    "UPDATE items SET status = 'leased', worker = ?, lease_until = ?, attempts = attempts + 1 "
+                    "WHERE id = ?",
+                    (worker_id, now + lease_seconds, row['id']))
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return dict(row) if row is not None else None
+
+    def heartbeat(self, item_id, worker_id, lease_seconds=QUEUE_LEASE_SECONDS):
+        cursor = self.connection.execute(
+            "UPDATE items SET lease_until = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time() + lease_seconds, item_id, worker_id))
+        return cursor.rowcount == 1
+
+    def complete(self, item_id, worker_id):
+        cursor = self.connection.execute(
+            "UPDATE items SET status = 'done', lease_until = NULL, error = NULL, finished = ? "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (time.time(), item_id, worker_id))
+        return cursor.rowcount == 1
+
+    def fail(self, item_id, worker_id, error, max_attempts=QUEUE_MAX_ATTEMPTS):
+        cursor = self.connection.execute(
+            "UPDATE items SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'pending' END, "
+            "worker = NULL, lease_until = NULL, error = ?, "
+            "finished = CASE WHEN attempts >= ? THEN ? ELSE NULL END "
+            "WHERE id = ? AND worker = ? AND status = 'leased'",
+            (max_attempts, error, max_attempts, time.time(), item_id, worker_id))
+        return cursor.rowcount == 1
+
+    def has_work(self):
+        row = self.connection.execute(
+            "SELECT COUNT(*) FROM items WHERE status IN ('pending', 'leased')").fetchone()
+        return row[0] > 0
+
+    def job_status(self, job_id=None):
+        query = ("SELECT jobs.id, jobs.name, jobs.output_folder, "
+                 "COALESCE(SUM(items.status = 'pending'), 0) AS pending, "
+                 "COALESCE(SUM(items.status = 'leased'), 0) AS leased, "
+                 "COALESCE(SUM(items.status = 'done'), 0) AS done, "
+                 "COALESCE(SUM(items.status = 'failed'), 0) AS failed, "
+                 "COUNT(items.id) AS total "
+                 "FROM jobs LEFT JOIN items ON items.job_id = jobs.id ")
+        params = ()
+        if job_id:
+            query += "WHERE jobs.id = ? "
+            params = (job_id,)
+        query += "GROUP BY jobs.id ORDER BY jobs.created"
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+    def failed_items(self, job_id):
+        rows = self.connection.execute(
+            "SELECT song, error, attempts FROM items WHERE job_id = ? AND status = 'failed' ORDER BY id",
+            (job_id,))
+        return [dict(row) for row in rows]
+
+def run_queue_worker(queue_path, worker_id, journal_mode="wal", lease_seconds=QUEUE_LEASE_SECONDS, wait=False,
+                     scratch_folder=None, concurrent_fragments=DEFAULT_CONCURRENT_FRAGMENTS,
+                     buffer_size=DEFAULT_BUFFER_SIZE):
+    queue = WorkQueue(queue_path, journal_mode)
+    downloaders = {}
+    lease_lock = threading.Lock()
+    lease = {'item_id': None, 'lost': False}
+    stop_heartbeat = threading.Event()
+
+    def send_heartbeats():
+        heartbeat_queue = WorkQueue(queue_path, journal_mode)
+        try:
+            while not stop_heartbeat.wait(lease_seconds / 3):
+                with lease_lock:
+                    item_id = None if lease['lost'] else lease['item_id']
+                if item_id is None:
+                    continue
+                try:
+                    if heartbeat_queue.heartbeat(item_id, worker_id, lease_seconds):
+                        continue
+                except sqlite3.Error as e:
+                    print(f"[{worker_id}] Heartbeat failed for item {item_id}: {str(e)}")
+                    continue
+                with lease_lock:
+                    if lease['item_id'] == item_id:
+                        lease['lost'] = True
+                        print(f"[{worker_id}] Lost lease on item {item_id}")
+        finally:
+            heartbeat_queue.close()
+
+    def still_leased(item_id):
+        with lease_lock:
+            if lease['lost']:
+                return False
+        return queue.heartbeat(item_id, worker_id, lease_seconds)
+
+    heartbeat = threading.Thread(target=send_heartbeats, daemon=True)
+    heartbeat.start()
+    try:
+        while True:
+            item = queue.claim(worker_id, lease_seconds)
+            if item is None:
+                if not wait and not queue.has_work():
+                    break
+                time.sleep(QUEUE_POLL_INTERVAL)
+                continue
+
+            with lease_lock:
+                lease['item_id'] = item['id']
+                lease['lost'] = False
+            try:
+                key = (item['output_folder'], item['format'], item['quality'])
+                if key not in downloaders:
+                    downloaders[key] = SongDownloader(*key, scratch_folder, concurrent_fragments, buffer_size)
+                print(f"[{worker_id}] Downloading: {item['song']}")
+                if not downloaders[key].download(item['song'], before_move=lambda: still_leased(item['id'])):
+                    print(f"[{worker_id}] Discarding {item['song']}: lease on item {item['id']} was lost")
+                elif not queue.complete(item['id'], worker_id):
+                    print(f"[{worker_id}] Lease on item {item['id']} was lost before it could be marked done")
+            except Exception as e:
+                print(f"[{worker_id}] Failed: {item['song']}: {str(e)}")
+                queue.fail(item['id'], worker_id, str(e))
+            finally:
+                with lease_lock:
+                    lease['item_id'] = None
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stop_heartbeat.set()
+        heartbeat.join()
+        for downloader in downloaders.values():
+            downloader.close()
+        queue.close()
+
+def save_session_snapshot(path, meta, tracks, checked, pending):
+    meta_bytes = json.dumps(meta).encode('utf-8')
+    strings = bytearray()
+    offsets = [0]
+    for track in tracks:
+        for field in SESSION_TRACK_FIELDS:
+            strings += (track.get(field) or "").encode('utf-8')
+            offsets.append(len(strings))
+
+    checked_bits = bytearray((len(tracks) + 7) // 8)
+    for i, is_checked in enumerate(checked):
+        if is_checked:
+            checked_bits[i >> 3] |= 1 << (i & 7)
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "wb") as file:
+        file.write(SESSION_HEADER.pack(SESSION_MAGIC, SESSION_VERSION, len(tracks), len(pending), len(meta_bytes)))
+        file.write(meta_bytes)
+        file.write(struct.pack(f"<{len(tracks)}I", *(track.get('duration_ms') or 0 for track in tracks)))
+        file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        file.write(checked_bits)
+        file.write(struct.pack(f"<{len(pending)}I", *pending))
+        file.write(strings)
+    os.replace(temp_path, path)
+
+def write_session(meta, songs, checked, pending_tracks):
+    try:
+        tracks = list(songs)
+        checked = list(checked) + [False] * len(pending_tracks)
+        pending = list(range(len(tracks), len(tracks) + len(pending_tracks)))
+        save_session_snapshot(SESSION_FILE, meta, tracks + pending_tracks, checked, pending)
+    except Exception as e:
+        print(f"Error saving session: {str(e)}")
+
+class SessionSnapshot:
+    def __init__(self, path):
+        with open(path, "rb") as file:
+            self.data = file.read()
+
+        if len(self.data) < SESSION_HEADER.size:
+            raise ValueError("Truncated session snapshot")
+        magic, version, self.count, self.pending_count, meta_length = SESSION_HEADER.unpack_from(self.data, 0)
+        if magic != SESSION_MAGIC or version != SESSION_VERSION:
+            raise ValueError("Unsupported session snapshot")
+
+        position = SESSION_HEADER.size
+        self.meta = json.loads(self.data[position:position + meta_length].decode('utf-8'))
+        position += meta_length
+        self.durations_offset = position
+        position += 4 * self.count
+        self.strings_index_offset = position
+        position += 4 * (self.count * len(SESSION_TRACK_FIELDS) + 1)
+        self.checked_offset = position
+        position += (self.count + 7) // 8
+        self.pending_offset = position
+        position += 4 * self.pending_count
+        self.strings_offset = position
+        if position > len(self.data):
+            raise ValueError("Truncated session snapshot")
+
+        offsets = struct.unpack_from(f"<{self.count * len(SESSION_TRACK_FIELDS) + 1}I", self.data,
+                                     self.strings_index_offset)
+        if offsets[0] != 0 or any(a > b for a, b in zip(offsets, offsets[1:])):
+            raise ValueError("Corrupt session snapshot")
+        if self.strings_offset + offsets[-1] > len(self.data):
+            raise ValueError("Truncated session snapshot")
+
+    def __len__(self):
+        return self.count
+
+    def track(self, index):
+        field_count = len(SESSION_TRACK_FIELDS)
+        offsets = struct.unpack_from(f"<{field_count + 1}I", self.data,
+                                     self.strings_index_offset + 4 * index * field_count)
+        track = {}
+        for i, field in enumerate(SESSION_TRACK_FIELDS):
+            start = self.strings_offset + offsets[i]
+            end = self.strings_offset + offsets[i + 1]
+            track[field] = self.data[start:end].decode('utf-8', errors='replace')
+        track['duration_ms'] = struct.unpack_from("<I", self.data, self.durations_offset + 4 * index)[0]
+        return track
+
+    def tracks(self, count=None):
+        return SnapshotTracks(self, self.count if count is None else min(count, self.count))
+
+    def is_checked(self, index):
+        return bool(self.data[self.checked_offset + (index >> 3)] & (1 << (index & 7)))
+
+    def checked_states(self):
+        return [self.is_checked(i) for i in range(self.count)]
+
+    def pending(self):
+        return list(struct.unpack_from(f"<{self.pending_count}I", self.data, self.pending_offset))
+
+class SnapshotTracks:
+    def __init__(self, snapshot, count):
+        self.snapshot = snapshot
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.snapshot.track(i) for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Track index out of range")
+        return self.snapshot.track(index)
+
+    def __iter__(self):
+        return (self.snapshot.track(i) for i in range(self.count))
+
 class LoginScreen(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -259,23 +1648,20 @@ class LoginScreen(QWidget):
         self.load_credentials()
 
     def load_credentials(self):
-        if os.path.exists("credential.cdi"):
-            try:
-                with open("credential.cdi", "r", encoding="utf-8") as file:
-                    lines = file.readlines()
-                    if len(lines) >= 2:
-                        client_id = decrypt_credentials(lines[0].strip())
-                        client_secret = decrypt_credentials(lines[1].strip())
-                        self.client_id.setText(client_id)
-                        self.client_secret.setText(client_secret)
-            except Exception as e:
-                self.status_label.setText(f"Error loading credentials: {str(e)}")
+        try:
+            credentials = load_saved_credentials()
+            if credentials:
+                client_id, client_secret = credentials
+                self.client_id.setText(client_id)
+                self.client_secret.setText(client_secret)
+        except Exception as e:
+            self.status_label.setText(f"Error loading credentials: {str(e)}")
 
     def save_credentials(self):
         try:
             encrypted_id = encrypt_credentials(self.client_id.text())
             encrypted_secret = encrypt_credentials(self.client_secret.text())
-            with open("credential.cdi", "w", encoding="utf-8") as file:
+            with open(CREDENTIALS_FILE, "w", encoding="utf-8") as file:
                 file.write(f"{encrypted_id}\n{encrypted_secret}")
         except Exception as e:
             self.status_label.setText(f"Error saving credentials: {str(e)}")
@@ -285,22 +1671,29 @@ class LoginScreen(QWidget):
             self.status_label.setText("Please enter both Client ID and Client Secret")
             return
 
-        try:
-            self.parent.sp = spotipy.Spotify(auth_manager=SpotifyClientCredentials(
-                client_id=self.client_id.text(),
-                client_secret=self.client_secret.text()
-            ))
-            self.save_credentials()
-            self.status_label.setText("Login successful!")
-            QTimer.singleShot(1000, self.parent.show_main_screen)
-        except Exception as e:
-            self.status_label.setText(f"Login failed: {str(e)}")
+        self.login_btn.setEnabled(False)
+        self.status_label.setText("Logging in...")
+
+        self.login_worker = LoginWorker(self.client_id.text(), self.client_secret.text())
+        self.login_worker.login_success.connect(self.on_login_success)
+        self.login_worker.error.connect(self.on_login_error)
+        self.login_worker.start()
+
+    def on_login_success(self, sp):
+        self.parent.sp = sp
+        self.save_credentials()
+        self.login_btn.setEnabled(True)
+        self.status_label.setText("Login successful!")
+        QTimer.singleShot(1000, self.parent.show_main_screen)
+
+    def on_login_error(self, error):
+        self.login_btn.setEnabled(True)
+        self.status_label.setText(f"Login failed: {error}")
 
     def clear_credentials(self):
         self.client_id.clear()
         self.client_secret.clear()
-        if os.path.exists("credential.cdi"):
-            os.remove("credential.cdi")
+        remove_saved_credentials()
         self.status_label.setText("Credentials cleared")
 
 class MainScreen(QWidget):
@@ -309,8 +1702,30 @@ class MainScreen(QWidget):
         self.parent = parent
         self.selected_playlist = None
         self.songs = []
+        self.download_queue = None
+        self.download_worker = None
+        self.status_before_index = None
+        self.session_writer = ThreadPoolExecutor(max_workers=1)
+        self.playlist_name = None
+        self.playlist_snapshot_id = None
+        self.loaded_playlist_url = None
+        self.pending_songs = []
+        self.pending_output_folder = None
+        self.refreshing = False
         self.init_ui()
 
+        self.save_timer = QTimer(self)
+        self.save_timer.setSingleShot(True)
+        self.save_timer.setInterval(SESSION_SAVE_DELAY)
+        self.save_timer.timeout.connect(self.save_session)
+        self.songs_model.checks_changed.connect(self.schedule_session_save)
+        self.format_combo.currentTextChanged.connect(self.schedule_session_save)
+        self.quality_combo.currentTextChanged.connect(self.schedule_session_save)
+        self.scratch_input.textChanged.connect(self.schedule_session_save)
+        self.fragments_spin.valueChanged.connect(self.schedule_session_save)
+        self.buffer_spin.valueChanged.connect(self.schedule_session_save)
+        self.restore_session()
+
     def init_ui(self):
         layout = QVBoxLayout(self)
         layout.setSpacing(20)
@@ -401,7 +1816,83 @@ class MainScreen(QWidget):
         self.load_playlist_btn.clicked.connect(self.load_playlist_songs)
         left_layout.addWidget(self.load_playlist_btn)
 
-        left_layout.addStretch()
+        queue_label = QLabel("Download Queue")
+        queue_label.setFont(QFont("Helvetica", 12, QFont.Bold))
+        queue_label.setStyleSheet("color: #FFFFFF; padding: 10px 0;")
+        left_layout.addWidget(queue_label)
+
+        self.schedule_combo = QComboBox()
+        self.schedule_combo.addItem("Playlist order", SCHEDULE_IN_ORDER)
+        self.schedule_combo.addItem("Shortest first", SCHEDULE_SHORTEST_FIRST)
+        self.schedule_combo.setStyleSheet("""
+            QComboBox {
+                background-color: 
+                color: 
+                border: 1px solid 
+                border-radius: 4px;
+                padding: 5px;
+            }
+            QComboBox::drop-down {
+                border: none;
+            }
+            QComboBox::down-arrow {
+                image: none;
+                border-left: 5px solid transparent;
+                border-right: 5px solid transparent;
+                border-top: 5px solid 
+            }
+        """)
+        self.schedule_combo.currentIndexChanged.connect(self.change_schedule_policy)
+        left_layout.addWidget(self.schedule_combo)
+
+        self.queue_list = QListWidget()
+        self.queue_list.setDragDropMode(QAbstractItemView.InternalMove)
+        self.queue_list.setStyleSheet("""
+            QListWidget {
+                background-color: 
+                color: 
+                border: 1px solid 
+                border-radius: 4px;
+                padding: 5px;
+            }
+            QListWidget::item {
+                padding: 6px;
+                border-bottom: 1px solid 
+            }
+            QListWidget::item:hover {
+                background-color: 
+            }
+        """)
+        self.queue_list.model().rowsMoved.connect(self.on_queue_reordered)
+        left_layout.addWidget(self.queue_list, 1)
+
+        queue_buttons_layout = QHBoxLayout()
+
+        self.priority_up_btn = QPushButton("Priority +")
+        self.priority_down_btn = QPushButton("Priority -")
+        self.pause_btn = QPushButton("Pause/Resume")
+        self.stop_btn = QPushButton("Stop")
+        self.stop_btn.setEnabled(False)
+        for button in (self.priority_up_btn, self.priority_down_btn, self.pause_btn, self.stop_btn):
+            button.setStyleSheet("""
+                QPushButton {
+                    background-color: 
+                    color: 
+                    border: none;
+                    border-radius: 15px;
+                    padding: 6px 12px;
+                    font-weight: bold;
+                }
+                QPushButton:hover {
+                    background-color: 
+                }
+            """)
+            queue_buttons_layout.addWidget(button)
+        self.priority_up_btn.clicked.connect(lambda: self.change_queue_priority(1))
+        self.priority_down_btn.clicked.connect(lambda: self.change_queue_priority(-1))
+        self.pause_btn.clicked.connect(self.toggle_queue_pause)
+        self.stop_btn.clicked.connect(self.stop_download)
+        left_layout.addLayout(queue_buttons_layout)
 
         content_layout.addWidget(left_panel, 1)
 
@@ -487,6 +1978,69 @@ class MainScreen(QWidget):
         """)
         settings_layout.addWidget(self.quality_combo, 1, 1)
 
+        scratch_label = QLabel("Temp folder:")
+        scratch_label.setStyleSheet("color: #B3B3B3;")
+        settings_layout.addWidget(scratch_label, 2, 0)
+
+        self.scratch_input = QLineEdit()
+        self.scratch_input.setPlaceholderText(tempfile.gettempdir())
+        self.scratch_input.setStyleSheet("""
+            QLineEdit {
+                background-color: 
+                color: 
+                border: 1px solid 
+                border-radius: 4px;
+                padding: 5px;
+            }
+        """)
+        settings_layout.addWidget(self.scratch_input, 2, 1)
+
+        self.scratch_browse_btn = QPushButton("Browse")
+        self.scratch_browse_btn.setStyleSheet("""
+            QPushButton {
+                background-color: 
+                color: 
+                border: none;
+                border-radius: 15px;
+                padding: 6px 12px;
+                font-weight: bold;
+            }
+            QPushButton:hover {
+                background-color: 
+            }
+        """)
+        self.scratch_browse_btn.clicked.connect(self.browse_scratch_folder)
+        settings_layout.addWidget(self.scratch_browse_btn, 2, 2)
+
+        fragments_label = QLabel("Parallel fragments:")
+        fragments_label.setStyleSheet("color: #B3B3B3;")
+        settings_layout.addWidget(fragments_label, 3, 0)
+
+        self.fragments_spin = QSpinBox()
+        self.fragments_spin.setRange(1, 16)
+        self.fragments_spin.setValue(DEFAULT_CONCURRENT_FRAGMENTS)
+        settings_layout.addWidget(self.fragments_spin, 3, 1)
+
+        buffer_label = QLabel("Buffer size (KiB):")
+        buffer_label.setStyleSheet("color: #B3B3B3;")
+        settings_layout.addWidget(buffer_label, 4, 0)
+
+        self.buffer_spin = QSpinBox()
+        self.buffer_spin.setRange(1, 65536)
+        self.buffer_spin.setValue(DEFAULT_BUFFER_SIZE // 1024)
+        settings_layout.addWidget(self.buffer_spin, 4, 1)
+
+        for spin_box in (self.fragments_spin, self.buffer_spin):
+            spin_box.setStyleSheet("""
+                QSpinBox {
+                    background-color: 
+                    color: 
+                    border: 1px solid 
+                    border-radius: 4px;
+                    padding: 5px;
+                }
+            """)
+
         right_layout.addWidget(settings_group)
 
         self.status_label = QLabel("")
@@ -499,6 +2053,25 @@ class MainScreen(QWidget):
         songs_label.setStyleSheet("color: #FFFFFF; padding: 10px 0;")
         right_layout.addWidget(songs_label)
 
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter by title, artist or album...")
+        self.filter_input.setClearButtonEnabled(True)
+        self.filter_input.setStyleSheet("""
+            QLineEdit {
+                background-color: 
+                color: 
+                border: 2px solid 
+                border-radius: 6px;
+                padding: 10px;
+                font-size: 14px;
+            }
+            QLineEdit:focus {
+                border: 2px solid 
+            }
+        """)
+        self.filter_input.textChanged.connect(self.filter_songs)
+        right_layout.addWidget(self.filter_input)
+
         select_layout = QHBoxLayout()
 
         self.select_all_btn = QPushButton("Select All")
@@ -538,24 +2111,44 @@ class MainScreen(QWidget):
         select_layout.addStretch()
         right_layout.addLayout(select_layout)
 
-        self.songs_list = QListWidget()
+        self.songs_model = SongListModel(self)
+        self.song_index = SongIndex([])
+        self.songs_list = QListView()
+        self.songs_list.setModel(self.songs_model)
+        self.songs_list.setUniformItemSizes(True)
         self.songs_list.setMinimumHeight(300)  
         self.songs_list.setStyleSheet("""
-            QListWidget {
+            QListView {
                 background-color: 
                 color: 
                 border: 1px solid 
                 border-radius: 4px;
                 padding: 5px;
+                font-size: 14px;
+                font-weight: bold;
             }
-            QListWidget::item {
+            QListView::item {
                 padding: 15px;
                 border-bottom: 1px solid 
                 min-height: 50px;
                 margin: 2px 0px;
             }
-            QListWidget::item:hover {
+            QListView::item:hover {
+                background-color: 
+            }
+            QListView::indicator {
+                width: 20px;
+                height: 20px;
+            }
+            QListView::indicator:checked {
                 background-color: 
+                border: 2px solid 
+                border-radius: 4px;
+            }
+            QListView::indicator:unchecked {
+                background-color: 
+                border: 2px solid 
+                border-radius: 4px;
             }
         """)
         right_layout.addWidget(self.songs_list)
@@ -613,9 +2206,12 @@ class MainScreen(QWidget):
 
         self.load_playlist_btn.setEnabled(False)
         self.load_playlist_btn.setText("Loading...")
-        self.status_label.setText("Loading playlist...")
-        self.songs_list.clear()
+        if not self.refreshing:
+            self.status_label.setText("Loading playlist...")
+            self.songs = []
+            self.update_songs_list()
 
+        self.requested_playlist_url = playlist_url
         self.playlist_loader = PlaylistLoader(self.parent.sp, playlist_url)
         self.playlist_loader.progress.connect(self.update_loading_status)
         self.playlist_loader.playlist_loaded.connect(self.on_playlist_loaded)
@@ -626,20 +2222,36 @@ class MainScreen(QWidget):
     def update_loading_status(self, message):
         self.status_label.setText(message)
 
-    def on_playlist_loaded(self, tracks, playlist_name):
+    def on_playlist_loaded(self, tracks, playlist_name, snapshot_id):
         print(f"Playlist loaded: {len(tracks)} tracks")  
         print(f"First few tracks: {tracks[:3] if tracks else 'No tracks'}")  
 
-        QTimer.singleShot(0, lambda: self._update_ui_with_songs(tracks, playlist_name))
+        QTimer.singleShot(0, lambda: self._update_ui_with_songs(tracks, playlist_name, snapshot_id))
 
-    def _update_ui_with_songs(self, tracks, playlist_name):
+    def _update_ui_with_songs(self, tracks, playlist_name, snapshot_id):
         print("Updating UI in main thread")  
+        checked = None
+        if self.refreshing:
+            previous = {track['id'] or track_label(track): is_checked
+                        for track, is_checked in zip(self.songs, self.get_checked_states())}
+            checked = [previous.get(track['id'] or track_label(track), True) for track in tracks]
+
         self.songs = tracks
-        self.update_songs_list()
+        self.playlist_name = playlist_name
+        self.playlist_snapshot_id = snapshot_id
+        self.loaded_playlist_url = self.requested_playlist_url
+        self.update_songs_list(checked)
         self.download_btn.setEnabled(True)
 
         self.load_playlist_btn.setEnabled(True)
         self.load_playlist_btn.setText("Load Playlist")
+        self.save_session()
+
+        if self.refreshing:
+            self.refreshing = False
+            self.status_label.setText(f"Playlist '{playlist_name}' changed, refreshed to {len(tracks)} songs")
+            return
+
         self.status_label.setText(f"Loaded {len(tracks)} songs from '{playlist_name}'")
 
         QMessageBox.information(self, "Success", f"Loaded {len(tracks)} songs from '{playlist_name}'")
@@ -655,122 +2267,153 @@ class MainScreen(QWidget):
         self.load_playlist_btn.setText("Load Playlist")
         self.status_label.setText("")
 
+        if self.refreshing:
+            self.refreshing = False
+            print(f"Session refresh failed: {error}")
+            return
+
         QMessageBox.warning(self, "Error", error)
 
     def on_playlist_finished(self):
         print("Playlist loader thread finished")  
 
-    def update_songs_list(self):
+    def update_songs_list(self, checked=None):
         print(f"Updating songs list with {len(self.songs)} songs")  
-        self.songs_list.clear()
-
-        if not self.songs:
-            print("No songs to display")
-            return
-
-        for i, song in enumerate(self.songs):
-            print(f"Adding song {i+1}: {song}")  
-
-            item = QListWidgetItem()
-            self.songs_list.addItem(item)
-
-            widget = QWidget()
-            layout = QHBoxLayout(widget)
-
-            checkbox = QCheckBox()
-            checkbox.setChecked(True)
-            checkbox.setStyleSheet("""
-                QCheckBox {
-                    color: 
-                    font-size: 14px;
-                    font-weight: bold;
-                }
-                QCheckBox::indicator {
-                    width: 20px;
-                    height: 20px;
-                }
-                QCheckBox::indicator:checked {
-                    background-color: 
-                    border: 2px solid 
-                    border-radius: 4px;
-                }
-                QCheckBox::indicator:unchecked {
-                    background-color: 
-                    border: 2px solid 
-                    border-radius: 4px;
-                }
-            """)
-
-            label = QLabel(song)
-            label.setStyleSheet("""
-                color: 
-                font-size: 14px;
-                font-weight: bold;
-                padding: 5px;
-            """)
-
-            layout.addWidget(checkbox)
-            layout.addWidget(label)
-            layout.addStretch()
-            layout.setContentsMargins(10, 10, 10, 10)
-            layout.setSpacing(15)
-
-            self.songs_list.setItemWidget(item, widget)
-
-        print(f"Songs list updated. Total items: {self.songs_list.count()}")  
-
-        self.songs_list.update()
-        self.songs_list.repaint()
+        self.songs_model.set_tracks(self.songs, checked)
+        self.song_index = None
+        self.filter_songs()
+
+        index_builder = IndexBuilder(self.songs, self)
+        index_builder.index_built.connect(self.on_index_built)
+        index_builder.finished.connect(index_builder.deleteLater)
+        index_builder.start()
+
+        print(f"Songs list updated. Total items: {self.songs_model.rowCount()}")  
+
+    def on_index_built(self, tracks, song_index):
+        if tracks is self.songs:
+            self.song_index = song_index
+            if self.status_before_index is not None:
+                if self.status_label.text() == "Building search index...":
+                    self.status_label.setText(self.status_before_index)
+                self.status_before_index = None
+            self.filter_songs()
+
+    def filter_songs(self):
+        query = self.filter_input.text()
+        indexing = self.song_index is None and bool(query.strip())
+        if self.song_index is not None:
+            self.songs_model.set_visible_rows(self.song_index.search(query))
+        else:
+            self.songs_model.set_visible_rows(None)
+        if indexing and self.status_before_index is None:
+            self.status_before_index = self.status_label.text()
+            self.status_label.setText("Building search index...")
+        self.select_all_btn.setEnabled(not indexing)
+        self.deselect_all_btn.setEnabled(not indexing)
+        if query.strip():
+            self.select_all_btn.setText("Select Matching")
+            self.deselect_all_btn.setText("Deselect Matching")
+        else:
+            self.select_all_btn.setText("Select All")
+            self.deselect_all_btn.setText("Deselect All")
 
     def select_all_songs(self):
-        for i in range(self.songs_list.count()):
-            item = self.songs_list.item(i)
-            widget = self.songs_list.itemWidget(item)
-            checkbox = widget.findChild(QCheckBox)
-            checkbox.setChecked(True)
+        self.songs_model.set_visible_checked(True)
 
     def deselect_all_songs(self):
-        for i in range(self.songs_list.count()):
-            item = self.songs_list.item(i)
-            widget = self.songs_list.itemWidget(item)
-            checkbox = widget.findChild(QCheckBox)
-            checkbox.setChecked(False)
+        self.songs_model.set_visible_checked(False)
+
+    def get_checked_states(self):
+        return self.songs_model.checked_states()
 
     def get_selected_songs(self):
-        selected_songs = []
-        for i in range(self.songs_list.count()):
-            item = self.songs_list.item(i)
-            widget = self.songs_list.itemWidget(item)
-            checkbox = widget.findChild(QCheckBox)
-            if checkbox.isChecked():
-                label = widget.findChild(QLabel)
-                selected_songs.append(label.text())
-        return selected_songs
+        return self.songs_model.checked_tracks()
 
     def download_songs(self):
-        selected_songs = self.get_selected_songs()
-        if not selected_songs:
-            QMessageBox.warning(self, "Warning", "Please select at least one song to download.")
-            return
+        output_folder = None
+        if self.pending_songs and self.pending_output_folder:
+            reply = QMessageBox.question(self, "Resume Downloads",
+                                         f"Resume {len(self.pending_songs)} downloads left over from the last session?",
+                                         QMessageBox.Yes | QMessageBox.No)
+            if reply == QMessageBox.Yes:
+                selected_tracks = self.pending_songs
+                output_folder = self.pending_output_folder
+            else:
+                self.pending_songs = []
+                self.schedule_session_save()
 
-        output_folder = QFileDialog.getExistingDirectory(self, "Select Download Folder")
         if not output_folder:
-            return
+            selected_tracks = self.get_selected_songs()
+            if not selected_tracks:
+                QMessageBox.warning(self, "Warning", "Please select at least one song to download.")
+                return
+
+            output_folder = QFileDialog.getExistingDirectory(self, "Select Download Folder")
+            if not output_folder:
+                return
 
+        selected_tracks, duplicate_groups = dedupe_tracks(selected_tracks)
+        if duplicate_groups:
+            self.report_duplicates(duplicate_groups)
+
+        selected_songs = [track_label(track) for track in selected_tracks]
         format_choice = self.format_combo.currentText().lower()
         quality = self.quality_combo.currentText()
 
-        self.download_worker = DownloadWorker(selected_songs, output_folder, format_choice, quality)
+        self.parent.refresh_token()
+
+        client = ServiceClient()
+        if client.is_available():
+            try:
+                job = client.submit_job(output_folder, format_choice, quality, songs=selected_songs)
+                self.download_worker = RemoteDownloadWorker(client, job['id'])
+                self.pending_songs = []
+            except Exception as e:
+                QMessageBox.critical(self, "Error", f"Download service rejected the job: {str(e)}")
+                return
+            self.set_local_download_controls_enabled(False)
+            self.status_label.setText("Downloading through the download service, "
+                                      "queue and transfer settings are managed by the service")
+        else:
+            self.download_queue = DownloadQueue(selected_tracks, self.schedule_combo.currentData())
+            self.download_worker = DownloadWorker(self.download_queue, output_folder, format_choice, quality,
+                                                  self.scratch_input.text().strip() or None,
+                                                  self.fragments_spin.value(), self.buffer_spin.value() * 1024)
+            self.download_worker.song_finished.connect(self.on_song_finished)
+            self.download_worker.queue_changed.connect(self.update_queue_list)
+            self.pending_songs = list(selected_tracks)
+            self.update_queue_list()
+        self.pending_output_folder = output_folder
+        self.save_session()
         self.download_worker.progress.connect(self.update_progress)
         self.download_worker.song_progress.connect(self.update_song_progress)
         self.download_worker.download_complete.connect(self.download_finished)
+        self.download_worker.download_stopped.connect(self.download_stopped)
         self.download_worker.error.connect(self.download_error)
 
         self.progress_bar.setVisible(True)
         self.progress_bar.setValue(0)
         self.download_btn.setEnabled(False)
+        self.stop_btn.setEnabled(True)
         self.download_worker.start()
 
+    def report_duplicates(self, duplicate_groups):
+        skipped = sum(len(group) - 1 for group in duplicate_groups)
+        details = []
+        for group in duplicate_groups:
+            details.append(f"Downloading: {track_label(group[0])}")
+            for track in group[1:]:
+                details.append(f"    skipped: {track_label(track)} ({track.get('album') or 'unknown album'})")
+
+        self.status_label.setText(f"Skipped {skipped} duplicate songs in {len(duplicate_groups)} groups")
+        message = QMessageBox(QMessageBox.Information, "Duplicates Found",
+                              f"{skipped} selected songs are duplicates of other selected songs "
+                              f"and will not be downloaded again ({len(duplicate_groups)} groups).",
+                              QMessageBox.Ok, self)
+        message.setDetailedText("\n".join(details))
+        message.exec_()
+
     def update_progress(self, message):
 
         pass
@@ -778,19 +2421,207 @@ class MainScreen(QWidget):
     def update_song_progress(self, song, progress):
         self.progress_bar.setValue(progress)
 
+    def on_song_finished(self, song):
+        for i, track in enumerate(self.pending_songs):
+            if track_label(track) == song:
+                del self.pending_songs[i]
+                break
+        self.schedule_session_save()
+
+    def update_queue_list(self):
+        current = self.queue_list.currentItem()
+        current_id = current.data(Qt.UserRole) if current else None
+
+        self.queue_list.blockSignals(True)
+        self.queue_list.clear()
+        if self.download_queue:
+            for item in self.download_queue.pending():
+                duration = (item['track'].get('duration_ms') or 0) // 1000
+                text = f"{track_label(item['track'])}  [{duration // 60}:{duration % 60:02d}]"
+                if item['priority']:
+                    text += f"  (priority {item['priority']:+d})"
+                if item['paused']:
+                    text = f"[paused] {text}"
+                list_item = QListWidgetItem(text)
+                list_item.setData(Qt.UserRole, item['id'])
+                self.queue_list.addItem(list_item)
+                if item['id'] == current_id:
+                    self.queue_list.setCurrentItem(list_item)
+        self.queue_list.blockSignals(False)
+
+    def selected_queue_item(self):
+        current = self.queue_list.currentItem()
+        if not self.download_queue or current is None:
+            return None
+        return self.download_queue.get(current.data(Qt.UserRole))
+
+    def change_queue_priority(self, delta):
+        item = self.selected_queue_item()
+        if item is not None:
+            self.download_queue.set_priority(item['id'], item['priority'] + delta)
+            self.update_queue_list()
+
+    def toggle_queue_pause(self):
+        item = self.selected_queue_item()
+        if item is not None:
+            self.download_queue.set_paused(item['id'], not item['paused'])
+            self.update_queue_list()
+
+    def change_schedule_policy(self):
+        if self.download_queue:
+            self.download_queue.set_policy(self.schedule_combo.currentData())
+            self.update_queue_list()
+
+    def on_queue_reordered(self):
+        if not self.download_queue:
+            return
+        item_ids = [self.queue_list.item(i).data(Qt.UserRole) for i in range(self.queue_list.count())]
+        self.download_queue.reorder(item_ids)
+        QTimer.singleShot(0, self.update_queue_list)
+
+    def set_local_download_controls_enabled(self, enabled):
+        for widget in (self.schedule_combo, self.queue_list, self.priority_up_btn, self.priority_down_btn,
+                       self.pause_btn, self.scratch_input, self.scratch_browse_btn, self.fragments_spin,
+                       self.buffer_spin):
+            widget.setEnabled(enabled)
+
+    def stop_download(self):
+        if self.download_worker:
+            self.stop_btn.setEnabled(False)
+            self.status_label.setText("Stopping after the current song...")
+            self.download_worker.stop()
+
+    def download_stopped(self):
+        self.download_queue = None
+        self.set_local_download_controls_enabled(True)
+        self.stop_btn.setEnabled(False)
+        self.update_queue_list()
+        self.save_session()
+        self.progress_bar.setVisible(False)
+        self.download_btn.setEnabled(True)
+        status = "Download stopped"
+        if self.pending_songs:
+            status += f", {len(self.pending_songs)} songs left to resume"
+        self.status_label.setText(status)
+
     def download_finished(self):
+        self.download_queue = None
+        self.set_local_download_controls_enabled(True)
+        self.stop_btn.setEnabled(False)
+        self.update_queue_list()
+        self.pending_songs = []
+        self.save_session()
         self.progress_bar.setVisible(False)
         self.download_btn.setEnabled(True)
         QMessageBox.information(self, "Success", "Download completed successfully!")
 
     def download_error(self, error):
+        self.download_queue = None
+        self.set_local_download_controls_enabled(True)
+        self.stop_btn.setEnabled(False)
+        self.update_queue_list()
         self.progress_bar.setVisible(False)
         self.download_btn.setEnabled(True)
         QMessageBox.critical(self, "Error", f"Download failed: {error}")
 
+    def browse_scratch_folder(self):
+        scratch_folder = QFileDialog.getExistingDirectory(self, "Select Temp Folder")
+        if scratch_folder:
+            self.scratch_input.setText(scratch_folder)
+
+    def schedule_session_save(self):
+        self.save_timer.start()
+
+    def save_session(self):
+        self.save_timer.stop()
+        if not self.songs:
+            return
+
+        meta = {
+            'playlist_url': self.loaded_playlist_url,
+            'playlist_name': self.playlist_name,
+            'snapshot_id': self.playlist_snapshot_id,
+            'format': self.format_combo.currentText(),
+            'quality': self.quality_combo.currentText(),
+            'output_folder': self.pending_output_folder,
+            'playlist_tracks': len(self.songs),
+            'scratch_folder': self.scratch_input.text().strip(),
+            'concurrent_fragments': self.fragments_spin.value(),
+            'buffer_size': self.buffer_spin.value() * 1024,
+        }
+        self.session_writer.submit(write_session, meta, self.songs, bytes(self.songs_model.checked),
+                                   list(self.pending_songs))
+
+    def restore_session(self):
+        if not os.path.exists(SESSION_FILE):
+            return
+
+        try:
+            snapshot = SessionSnapshot(SESSION_FILE)
+            meta = snapshot.meta
+            if not isinstance(meta, dict):
+                raise ValueError("Session metadata must be an object")
+            for key in ('playlist_url', 'playlist_name', 'snapshot_id', 'output_folder', 'format', 'quality',
+                        'scratch_folder'):
+                validate_field(meta, key, str)
+            concurrent_fragments = validate_field(meta, 'concurrent_fragments', int,
+                                                  default=DEFAULT_CONCURRENT_FRAGMENTS)
+            buffer_size = validate_field(meta, 'buffer_size', int, default=DEFAULT_BUFFER_SIZE) // 1024
+            if not self.fragments_spin.minimum() <= concurrent_fragments <= self.fragments_spin.maximum():
+                raise ValueError(f"Invalid fragment count: {concurrent_fragments}")
+            if not self.buffer_spin.minimum() <= buffer_size <= self.buffer_spin.maximum():
+                raise ValueError(f"Invalid buffer size: {buffer_size} KiB")
+            playlist_tracks = validate_field(meta, 'playlist_tracks', int, default=len(snapshot))
+            songs = snapshot.tracks(max(playlist_tracks, 0))
+            checked = snapshot.checked_states()[:len(songs)]
+            pending_songs = [snapshot.track(i) for i in snapshot.pending() if i < len(snapshot)]
+        except Exception as e:
+            print(f"Error loading session: {str(e)}")
+            return
+
+        self.loaded_playlist_url = meta.get('playlist_url')
+        self.playlist_name = meta.get('playlist_name')
+        self.playlist_snapshot_id = meta.get('snapshot_id')
+        self.pending_output_folder = meta.get('output_folder')
+        self.playlist_url.setText(self.loaded_playlist_url or "")
+        self.format_combo.setCurrentText(meta.get('format') or "MP3")
+        self.quality_combo.setCurrentText(meta.get('quality') or "192k")
+        self.scratch_input.setText(meta.get('scratch_folder') or "")
+        self.fragments_spin.setValue(concurrent_fragments)
+        self.buffer_spin.setValue(buffer_size)
+
+        self.pending_songs = pending_songs
+        self.songs = songs
+        self.update_songs_list(checked)
+        self.download_btn.setEnabled(bool(self.songs))
+
+        status = f"Restored {len(self.songs)} songs from '{self.playlist_name}'"
+        if self.pending_songs:
+            status += f", {len(self.pending_songs)} downloads pending"
+        self.status_label.setText(status)
+
+    def check_for_playlist_changes(self):
+        if not self.parent.sp or not self.loaded_playlist_url or not self.playlist_snapshot_id:
+            return
+        if self.refreshing:
+            return
+
+        self.snapshot_checker = SnapshotChecker(self.parent.sp, self.loaded_playlist_url)
+        self.snapshot_checker.snapshot_checked.connect(self.on_snapshot_checked)
+        self.snapshot_checker.error.connect(lambda error: print(f"Snapshot check failed: {error}"))
+        self.snapshot_checker.start()
+
+    def on_snapshot_checked(self, snapshot_id):
+        if snapshot_id == self.playlist_snapshot_id:
+            return
+
+        self.refreshing = True
+        self.status_label.setText("Playlist changed since last session, refreshing...")
+        self.playlist_url.setText(self.loaded_playlist_url)
+        self.load_playlist_songs()
+
     def logout(self):
-        if os.path.exists("credential.cdi"):
-            os.remove("credential.cdi")
+        remove_saved_credentials()
         self.parent.sp = None
         self.parent.show_login_screen()
 
@@ -800,8 +2631,13 @@ class SpotifyDownloader(QMainWindow):
         self.setWindowTitle("Spotify Downloader")
         self.setGeometry(100, 100, 1200, 800)
         self.sp = None
+        self.token_refresher = None
         self.init_ui()
 
+        self.token_timer = QTimer(self)
+        self.token_timer.timeout.connect(self.refresh_token)
+        self.token_timer.start(TOKEN_CHECK_INTERVAL)
+
     def init_ui(self):
 
         self.stacked_widget = QStackedWidget()
@@ -826,8 +2662,217 @@ class SpotifyDownloader(QMainWindow):
 
     def show_main_screen(self):
         self.stacked_widget.setCurrentWidget(self.main_screen)
+        self.main_screen.check_for_playlist_changes()
+
+    def closeEvent(self, event):
+        self.main_screen.save_session()
+        super().closeEvent(event)
+
+    def refresh_token(self):
+        if not self.sp or (self.token_refresher and self.token_refresher.isRunning()):
+            return
+        self.token_refresher = TokenRefresher(self.sp)
+        self.token_refresher.error.connect(lambda error: print(f"Token refresh failed: {error}"))
+        self.token_refresher.start()
+
+def run_service(host, port, max_concurrent, scratch_folder, concurrent_fragments, buffer_size):
+    credentials = load_saved_credentials()
+    if not credentials:
+        print("No saved credentials found. Log in once with the GUI first.")
+        return 1
+
+    service = DownloadService(create_spotify_client(*credentials), max_concurrent, scratch_folder,
+                              concurrent_fragments, buffer_size)
+    handler = type("BoundServiceRequestHandler", (ServiceRequestHandler,),
+                   {'service': service, 'token': load_service_token(create=True)})
+    server = ThreadingHTTPServer((host, port), handler)
+    print(f"Download service listening on http://{host}:{port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+    return 0
+
+def run_shard(queue_path, journal_mode, playlist_url, output_folder, format_choice, quality):
+    credentials = load_saved_credentials()
+    if not credentials:
+        print("No saved credentials found. Log in once with the GUI first.")
+        return 1
+
+    playlist_id = extract_playlist_id(playlist_url)
+    if not playlist_id:
+        print("Invalid playlist URL. Please enter a valid Spotify playlist URL.")
+        return 1
+
+    sp = create_spotify_client(*credentials)
+    playlist_name = sp.playlist(playlist_id, fields="name")['name']
+    tracks, duplicate_groups = dedupe_tracks(fetch_playlist_tracks(sp, playlist_id))
+    songs = [track_label(track) for track in tracks]
+    for group in duplicate_groups:
+        print(f"Skipping {len(group) - 1} duplicates of '{track_label(group[0])}'")
+    if not songs:
+        print(f"Playlist '{playlist_name}' has no songs to download.")
+        return 1
+
+    queue = WorkQueue(queue_path, journal_mode)
+    try:
+        job_id = queue.create_job(songs, output_folder, format_choice, quality, playlist_name)
+    finally:
+        queue.close()
+    print(f"Queued job {job_id}: {len(songs)} songs from '{playlist_name}'")
+    return 0
+
+def run_queue_workers(queue_path, journal_mode, processes, lease_seconds, wait, scratch_folder,
+                      concurrent_fragments, buffer_size):
+    hostname = socket.gethostname()
+    workers = []
+    for i in range(processes):
+        worker_id = f"{hostname}-{os.getpid()}-{i}"
+        worker = multiprocessing.Process(target=run_queue_worker,
+                                         args=(queue_path, worker_id, journal_mode, lease_seconds, wait,
+                                               scratch_folder, concurrent_fragments, buffer_size))
+        worker.start()
+        workers.append(worker)
+
+    try:
+        for worker in workers:
+            worker.join()
+    except KeyboardInterrupt:
+        for worker in workers:
+            worker.join()
+    return 0
+
+def print_queue_status(queue_path, journal_mode, job_id):
+    queue = WorkQueue(queue_path, journal_mode)
+    try:
+        for job in queue.job_status(job_id):
+            print(f"{job['id']}  {job['done']}/{job['total']} done  {job['leased']} in progress  "
+                  f"{job['pending']} pending  {job['failed']} failed  {job['name'] or ''} -> {job['output_folder']}")
+            if job_id:
+                for item in queue.failed_items(job['id']):
+                    print(f"    failed after {item['attempts']} attempts: {item['song']}: {item['error']}")
+    finally:
+        queue.close()
+    return 0
+
+def print_job(job):
+    print(f"{job['id']}  {job['status']:<10}  {job['done']}/{job['total']}  {job['progress']}%  "
+          f"{job['playlist_name'] or job['playlist_url'] or ''}")
+    if job['duplicates']:
+        print(f"    skipped {job['duplicates']} duplicate songs")
+    for failure in job['failed']:
+        print(f"    failed: {failure['song']}: {failure['error']}")
+
+def run_cli(argv):
+    parser = argparse.ArgumentParser(prog="downloader.py", description="Spotify Downloader")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    transfer_options = argparse.ArgumentParser(add_help=False)
+    transfer_options.add_argument("--scratch-dir", help="local folder for partial downloads and transcodes")
+    transfer_options.add_argument("--fragments", type=int, default=DEFAULT_CONCURRENT_FRAGMENTS,
+                                  help="fragments yt-dlp downloads in parallel")
+    transfer_options.add_argument("--buffer-size", type=int, default=DEFAULT_BUFFER_SIZE,
+                                  help="yt-dlp download buffer size in bytes")
+
+    serve = commands.add_parser("serve", parents=[transfer_options], help="run the local download service")
+    serve.add_argument("--concurrency", type=int, default=SERVICE_CONCURRENCY)
+
+    submit = commands.add_parser("submit", help="submit a playlist download job")
+    submit.add_argument("playlist_url")
+    submit.add_argument("output_folder")
+    submit.add_argument("--format", default="mp3", choices=FORMAT_CHOICES)
+    submit.add_argument("--quality", default="192k", choices=QUALITY_CHOICES)
+
+    status = commands.add_parser("status", help="show job progress")
+    status.add_argument("job_id", nargs="?")
+
+    cancel = commands.add_parser("cancel", help="cancel a job")
+    cancel.add_argument("job_id")
+
+    sync = commands.add_parser("sync", help="register a playlist for periodic sync")
+    sync.add_argument("playlist_url")
+    sync.add_argument("output_folder")
+    sync.add_argument("--format", default="mp3", choices=FORMAT_CHOICES)
+    sync.add_argument("--quality", default="192k", choices=QUALITY_CHOICES)
+    sync.add_argument("--interval", type=int, default=3600, help="seconds between syncs")
+
+    commands.add_parser("syncs", help="list registered syncs")
+
+    unsync = commands.add_parser("unsync", help="remove a registered sync")
+    unsync.add_argument("sync_id")
+
+    queue_options = argparse.ArgumentParser(add_help=False)
+    queue_options.add_argument("--queue", default=QUEUE_FILE, help="path to the shared queue database")
+    queue_options.add_argument("--journal-mode", default="wal", choices=["wal", "delete"],
+                               help="use 'delete' when workers on several hosts share the queue over a network volume")
+
+    shard = commands.add_parser("shard", parents=[queue_options], help="split a playlist into shared queue items")
+    shard.add_argument("playlist_url")
+    shard.add_argument("output_folder")
+    shard.add_argument("--format", default="mp3", choices=FORMAT_CHOICES)
+    shard.add_argument("--quality", default="192k", choices=QUALITY_CHOICES)
+
+    worker = commands.add_parser("worker", parents=[queue_options, transfer_options],
+                                 help="process items from the shared queue")
+    worker.add_argument("--processes", type=int, default=1)
+    worker.add_argument("--lease", type=int, default=QUEUE_LEASE_SECONDS, help="lease timeout in seconds")
+    worker.add_argument("--wait", action="store_true", help="keep polling when the queue is empty")
+
+    queue_status = commands.add_parser("queue-status", parents=[queue_options], help="show shared queue progress")
+    queue_status.add_argument("job_id", nargs="?")
+
+    args = parser.parse_args(argv)
+    if args.command == "serve":
+        return run_service(args.host, args.port, args.concurrency, args.scratch_dir, args.fragments, args.buffer_size)
+    if args.command == "shard":
+        return run_shard(args.queue, args.journal_mode, args.playlist_url,
+                         os.path.abspath(args.output_folder), args.format, args.quality)
+    if args.command == "worker":
+        return run_queue_workers(args.queue, args.journal_mode, args.processes, args.lease, args.wait,
+                                 args.scratch_dir, args.fragments, args.buffer_size)
+    if args.command == "queue-status":
+        return print_queue_status(args.queue, args.journal_mode, args.job_id)
+
+    client = ServiceClient(args.host, args.port)
+    try:
+        if args.command == "submit":
+            job = client.submit_job(os.path.abspath(args.output_folder), args.format, args.quality,
+                                    playlist_url=args.playlist_url)
+            print(f"Submitted job {job['id']}")
+        elif args.command == "status":
+            jobs = [client.get_job(args.job_id)] if args.job_id else client.list_jobs()
+            for job in jobs:
+                print_job(job)
+        elif args.command == "cancel":
+            print_job(client.cancel_job(args.job_id))
+        elif args.command == "sync":
+            sync = client.register_sync(args.playlist_url, os.path.abspath(args.output_folder),
+                                        args.format, args.quality, args.interval)
+            print(f"Registered sync {sync['id']} every {sync['interval']}s")
+        elif args.command == "syncs":
+            for sync in client.list_syncs():
+                print(f"{sync['id']}  every {sync['interval']}s  {sync['downloaded']} downloaded  "
+                      f"{sync['playlist_url']} -> {sync['output_folder']}")
+        elif args.command == "unsync":
+            client.remove_sync(args.sync_id)
+            print(f"Removed sync {args.sync_id}")
+    except requests.RequestException:
+        print(f"Download service is not running on {client.base_url}. Start it with: downloader.py serve")
+        return 1
+    except RuntimeError as e:
+        print(f"Error: {str(e)}")
+        return 1
+    return 0
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_cli(sys.argv[1:]))
+
     app = QApplication(sys.argv)
     app.setFont(QFont("Helvetica", 10))
     window = SpotifyDownloader()
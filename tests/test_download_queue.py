@@ -0,0 +1,69 @@
+import pytest
+
+downloader = pytest.importorskip("downloader")
+
+
+def make_queue(durations, policy=None):
+    tracks = [{'name': name, 'artist': 'Artist', 'duration_ms': duration}
+              for name, duration in zip("ABCD", durations)]
+    if policy is None:
+        return downloader.DownloadQueue(tracks)
+    return downloader.DownloadQueue(tracks, policy)
+
+
+def names(queue):
+    return [item['track']['name'] for item in queue.pending()]
+
+
+def ids(queue, order):
+    by_name = {item['track']['name']: item['id'] for item in queue.pending()}
+    return [by_name[name] for name in order]
+
+
+def test_drops_follow_the_displayed_order():
+    queue = make_queue([1000, 2000, 3000, 4000])
+    for order in (["A", "C", "D", "B"], ["C", "D", "A", "B"], ["B", "C", "D", "A"]):
+        queue.reorder(ids(queue, order))
+        assert names(queue) == order
+
+
+def test_drag_pop_and_drag_again():
+    queue = make_queue([1000, 2000, 3000, 4000])
+    queue.reorder(ids(queue, ["D", "A", "B", "C"]))
+    assert queue.next_item()['track']['name'] == "D"
+    assert names(queue) == ["A", "B", "C"]
+
+    queue.reorder(ids(queue, ["C", "A", "B"]))
+    assert queue.next_item()['track']['name'] == "C"
+    assert queue.next_item()['track']['name'] == "A"
+    assert names(queue) == ["B"]
+
+
+def test_drop_overrides_shortest_first_until_policy_changes():
+    queue = make_queue([4000, 1000, 3000, 2000], downloader.SCHEDULE_SHORTEST_FIRST)
+    assert names(queue) == ["B", "D", "C", "A"]
+
+    queue.reorder(ids(queue, ["A", "B", "D", "C"]))
+    assert names(queue) == ["A", "B", "D", "C"]
+    assert queue.next_item()['track']['name'] == "A"
+
+    queue.set_policy(downloader.SCHEDULE_SHORTEST_FIRST)
+    assert names(queue) == ["B", "D", "C"]
+
+
+def test_reorder_keeps_priorities():
+    queue = make_queue([1000, 2000, 3000, 4000])
+    queue.set_priority(ids(queue, ["D"])[0], 2)
+    assert names(queue) == ["D", "A", "B", "C"]
+
+    queue.reorder(ids(queue, ["A", "D", "B", "C"]))
+    assert [item['priority'] for item in queue.pending()] == [0, 2, 0, 0]
+    assert names(queue) == ["A", "D", "B", "C"]
+
+
+def test_paused_items_are_skipped():
+    queue = make_queue([1000, 2000])
+    queue.set_paused(ids(queue, ["A"])[0], True)
+    assert queue.next_item()['track']['name'] == "B"
+    assert queue.next_item() is None
+    assert queue.has_items()